@@ -1,26 +1,128 @@
 import streamlit as st
-import pandas as pd
-import requests
-from prophet import Prophet
+import math
+import uuid
 import plotly.express as px
 from streamlit_folium import st_folium
 import folium
 from folium.plugins import Draw
 from datetime import datetime
-from geopy.geocoders import Nominatim
-import time
 import google.generativeai as genai
 
+import jobs
+import shared_cache
+from charts import (DEFAULT_CHART_WIDTH_PX, downsample, downsample_groups, memoize, point_budget,
+                    render_mode)
+from forecasting import (DEFAULT_BACKEND, DEFAULT_TARGETS, FORECAST_BACKENDS, FORECAST_DAYS,
+                         FORECAST_TARGETS, combine_site_forecasts, forecast_tasks, site_forecast_tasks,
+                         summarize_site_forecasts)
+from geocoding import reverse_geocode_async
+from geometry import parse_sites, selection_from_drawing, unique_site_name
+from http_client import latency_stats
+from tables import (DEFAULT_PAGE_SIZE, PAGE_SIZES, filter_positions, page_count, page_rows,
+                    sort_positions)
+from weather_data import (VARIABLE_LABELS, dataset_key, display_labels, fetch_area_weather,
+                          fetch_sites, fetch_weather_data, resample)
+
+# Panels per row in the site comparison's small-multiples layout
+SMALL_MULTIPLE_COLUMNS = 4
+
 # Initialize session state
+if "session_token" not in st.session_state:
+    st.session_state.session_token = uuid.uuid4().hex
 if "historical_data" not in st.session_state:
     st.session_state.historical_data = None
-if "forecast_temp" not in st.session_state:
-    st.session_state.forecast_temp = None
-if "forecast_precip" not in st.session_state:
-    st.session_state.forecast_precip = None
+if "historical_key" not in st.session_state:
+    st.session_state.historical_key = None
+if "hourly_data" not in st.session_state:
+    st.session_state.hourly_data = None
+if "hourly_key" not in st.session_state:
+    st.session_state.hourly_key = None
+if "rollup_keys" not in st.session_state:
+    st.session_state.rollup_keys = []
+if "forecast_keys" not in st.session_state:
+    st.session_state.forecast_keys = []
+if "forecasts" not in st.session_state:
+    st.session_state.forecasts = None
+if "forecast_job" not in st.session_state:
+    st.session_state.forecast_job = None
+if "forecast_job_backend" not in st.session_state:
+    st.session_state.forecast_job_backend = None
+if "forecast_backend" not in st.session_state:
+    st.session_state.forecast_backend = DEFAULT_BACKEND
+if "forecast_error" not in st.session_state:
+    st.session_state.forecast_error = None
+if "comparison_data" not in st.session_state:
+    st.session_state.comparison_data = None
+if "comparison_key" not in st.session_state:
+    st.session_state.comparison_key = None
+if "batch_forecast_job" not in st.session_state:
+    st.session_state.batch_forecast_job = None
+if "batch_forecast_key" not in st.session_state:
+    st.session_state.batch_forecast_key = None
+if "batch_forecasts" not in st.session_state:
+    st.session_state.batch_forecasts = None
+if "batch_forecast_note" not in st.session_state:
+    st.session_state.batch_forecast_note = None
+if "base_map" not in st.session_state:
+    st.session_state.base_map = None
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
+# ================= Shared Frame Helpers =================
+def selection_keys():
+    """Shared cache keys of the selected area's data, rollups and forecasts"""
+    return [st.session_state.historical_key, st.session_state.hourly_key,
+            *st.session_state.forecast_keys, *st.session_state.rollup_keys]
+
+def held_keys():
+    """Shared cache keys this session's frames point at"""
+    return [*selection_keys(), st.session_state.comparison_key, st.session_state.batch_forecast_key]
+
+def release_session_frames(keys=None):
+    token = st.session_state.session_token
+    for key in selection_keys() if keys is None else keys:
+        shared_cache.frames.release(key, token)
+
+def rollup_base_key():
+    """Shared cache key of the finest data loaded"""
+    if st.session_state.hourly_data is not None:
+        return st.session_state.hourly_key
+    return st.session_state.historical_key
+
+def rollup_frame(period):
+    """Daily/weekly/monthly rollup of the finest data loaded, built on first use"""
+    if st.session_state.hourly_data is not None:
+        base = st.session_state.hourly_data
+    else:
+        base = st.session_state.historical_data
+    key = (rollup_base_key(), "rollup", period)
+    if key not in st.session_state.rollup_keys:
+        st.session_state.rollup_keys.append(key)
+    return shared_cache.frames.acquire(key, st.session_state.session_token,
+                                       lambda: resample(base, period))
+
+# ================= Map Helpers =================
+def base_map():
+    """Folium map with the draw tool, built once per session"""
+    if st.session_state.base_map is None:
+        m = folium.Map(location=[0, 0], zoom_start=2)
+        Draw(export=True, draw_options={"rectangle": True}).add_to(m)
+        st.session_state.base_map = m
+    return st.session_state.base_map
+
+def selection_overlay():
+    """Marker for the point weather is fetched for, drawn over the base map"""
+    drawn = selection_from_drawing((st.session_state.get("selection_map") or {}).get("last_active_drawing"))
+    if drawn is None:
+        return None
+    overlay = folium.FeatureGroup(name="Selection")
+    folium.Marker(drawn.centroid, tooltip="Weather sample point").add_to(overlay)
+    return overlay
+
+# Frames in session state point into the process-wide shared cache; keep
+# this session's references alive while it is active
+shared_cache.frames.touch(held_keys(), st.session_state.session_token)
+
 # Page configuration
 st.set_page_config(layout="wide")
 st.title("🌦️ Smart Weather Analysis Dashboard")
@@ -31,56 +133,296 @@ left_col, right_col = st.columns([1, 1])
 # ================= Left Column (Map + Historical Data) =================
 with left_col:
     st.subheader("🗺️ Select Area")
-    m = folium.Map(location=[0, 0], zoom_start=2)
-    Draw(export=True, draw_options={"rectangle": True}).add_to(m)
-    map_data = st_folium(m, width=500, height=400)
+    # The base map is reused across reruns; only the selection overlay is
+    # sent as a delta, and panning/zooming no longer triggers reruns
+    map_data = st_folium(
+        base_map(),
+        key="selection_map",
+        feature_group_to_add=selection_overlay(),
+        returned_objects=["last_active_drawing", "all_drawings"],
+        width=500,
+        height=400
+    )
+    # Parsed once; the location details and fetch controls read from this
+    selection = selection_from_drawing(map_data.get("last_active_drawing"))
     
     # Historical Data Section
     if st.session_state.historical_data is not None:
         st.subheader("📜 Historical Weather Data")
         
-        # Rename columns for better understanding
-        historical_df = st.session_state.historical_data.rename(columns={
-            "time": "Date",
-            "temperature_2m_max": "Max Temp (°C)",
-            "temperature_2m_min": "Min Temp (°C)",
-            "precipitation_sum": "Precipitation (mm)",
-            "rain_sum": "Rain (mm)",
-            "windspeed_10m_max": "Max Wind (km/h)"
-        })
+        # Rollups are computed from the loaded data, so switching never refetches
+        views = ["Daily", "Weekly", "Monthly"]
+        if st.session_state.hourly_data is not None:
+            views.insert(0, "Hourly")
+        view = st.radio("Resolution", views, index=views.index("Daily"), horizontal=True)
+        if view == "Hourly":
+            view_data, view_key = st.session_state.hourly_data, st.session_state.hourly_key
+        elif view == "Daily":
+            view_data, view_key = st.session_state.historical_data, st.session_state.historical_key
+        else:
+            view_data = rollup_frame(view.lower())
+            view_key = (rollup_base_key(), "rollup", view.lower())
+        
+        # Rename columns for better understanding; shared frames never change
+        # under a key, so the renamed copy and figures are built once per key
+        historical_df = memoize((view_key, "display"), lambda: view_data.rename(
+            columns=display_labels(view_data.columns)
+        ))
+        
+        if view == "Hourly":
+            date_column = st.column_config.DatetimeColumn(format="YYYY-MM-DD HH:mm")
+        else:
+            date_column = st.column_config.DateColumn(format="YYYY-MM-DD")
+        
+        # Sorting and filtering run server-side; only the visible page is sent
+        sort_col, order_col, filter_col = st.columns(3)
+        sort_by = sort_col.selectbox("Sort by", list(historical_df.columns))
+        ascending = order_col.radio("Order", ["Ascending", "Descending"], horizontal=True) == "Ascending"
+        filter_by = filter_col.selectbox("Filter by", ["None"] + list(historical_df.columns[1:]))
+        table_filter = None
+        if filter_by != "None":
+            low, high = memoize((view_key, "range", filter_by), lambda: (
+                float(historical_df[filter_by].min()), float(historical_df[filter_by].max())
+            ))
+            if low < high:
+                table_filter = (filter_by, *st.slider(f"{filter_by} range", low, high, (low, high)))
+        
+        positions = memoize((view_key, "rows", sort_by, ascending, table_filter), lambda: sort_positions(
+            historical_df, filter_positions(historical_df, *(table_filter or ())), sort_by, ascending
+        ))
+        size_col, page_col = st.columns(2)
+        page_size = size_col.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE))
+        pages = page_count(len(positions), page_size)
+        page = page_col.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1)
+        st.dataframe(page_rows(historical_df, positions, page, page_size), use_container_width=True,
+                     hide_index=True, column_config={"Date": date_column})
+        first_row = min(len(positions), (page - 1) * page_size + 1)
+        last_row = min(len(positions), page * page_size)
+        st.caption(f"Rows {first_row:,}–{last_row:,} of {len(positions):,}"
+                   + (f" (filtered from {len(historical_df):,})" if table_filter else ""))
+        memory = view_data.attrs.get("memory_report")
+        if memory:
+            st.caption(f"{memory['rows']:,} rows · {memory['bytes'] / 1024:.1f} KiB in memory")
+        
+        # Hourly frames carry the raw variables, rollups the daily ones
+        if view == "Hourly":
+            temp_columns = ["temperature_2m"]
+            precip_column, wind_column = "precipitation", "windspeed_10m"
+        else:
+            temp_columns = ["temperature_2m_max", "temperature_2m_min"]
+            precip_column, wind_column = "precipitation_sum", "windspeed_10m_max"
+        
+        # Charts show the zoom window; long windows are downsampled to the
+        # chart's point budget and short ones are drawn at full resolution
+        zoom = None
+        if len(historical_df) > 1:
+            first, last = historical_df["Date"].iloc[0], historical_df["Date"].iloc[-1]
+            zoom = st.slider(
+                "Zoom",
+                min_value=first.to_pydatetime(),
+                max_value=last.to_pydatetime(),
+                value=(first.to_pydatetime(), last.to_pydatetime()),
+                format="YYYY-MM-DD"
+            )
+        
+        def zoomed_frame():
+            if zoom is None:
+                return historical_df
+            # Dates are sorted, so the window is a positional slice rather
+            # than a masked copy held in the memo
+            dates = historical_df["Date"]
+            start = dates.searchsorted(zoom[0], side="left")
+            stop = dates.searchsorted(zoom[1], side="right")
+            return historical_df.iloc[start:stop]
+        
+        chart_df = memoize((view_key, "zoom", zoom), zoomed_frame)
+        budget = point_budget()
+        if len(chart_df) > budget:
+            st.caption(f"Charts downsampled to about {budget:,} of {len(chart_df):,} points; "
+                       "zoom in for full resolution")
+        
+        def temperature_figure():
+            temp_labels = [VARIABLE_LABELS[column] for column in temp_columns]
+            temp_df = downsample(chart_df, "Date", temp_labels, budget)
+            return px.line(
+                temp_df,
+                x="Date",
+                y=temp_labels,
+                title="Temperature Trends",
+                render_mode=render_mode(temp_df, temp_labels)
+            )
         
-        st.dataframe(historical_df, use_container_width=True)
+        def precipitation_figure():
+            # Bars keep each bucket's extremes so rain peaks are not smoothed away
+            return px.bar(
+                downsample(chart_df, "Date", [VARIABLE_LABELS[precip_column]], budget, method="minmax"),
+                x="Date",
+                y=VARIABLE_LABELS[precip_column],
+                title=f"{view} Precipitation"
+            )
+        
+        def wind_figure():
+            wind_df = downsample(chart_df, "Date", [VARIABLE_LABELS[wind_column]], budget)
+            return px.line(
+                wind_df,
+                x="Date",
+                y=VARIABLE_LABELS[wind_column],
+                title="Wind Speed",
+                render_mode=render_mode(wind_df, [wind_column])
+            )
         
         # Tabbed Visualizations
         tab1, tab2, tab3 = st.tabs(["Temperature", "Precipitation", "Wind"])
         
         with tab1:
-            fig_temp = px.line(
-                historical_df,
-                x="Date",
-                y=["Max Temp (°C)", "Min Temp (°C)"],
-                title="Temperature Trends"
-            )
+            fig_temp = memoize((view_key, "temperature", zoom, budget), temperature_figure)
             st.plotly_chart(fig_temp, use_container_width=True)
         
         with tab2:
-            fig_precip = px.bar(
-                historical_df,
-                x="Date",
-                y="Precipitation (mm)",
-                title="Daily Precipitation"
-            )
+            fig_precip = memoize((view_key, "precipitation", zoom, budget), precipitation_figure)
             st.plotly_chart(fig_precip, use_container_width=True)
         
         with tab3:
-            fig_wind = px.line(
-                historical_df,
-                x="Date",
-                y="Max Wind (km/h)",
-                title="Wind Speed"
-            )
+            fig_wind = memoize((view_key, "wind", zoom, budget), wind_figure)
             st.plotly_chart(fig_wind, use_container_width=True)
 
+    # Site Comparison Section
+    if st.session_state.comparison_data is not None:
+        st.subheader("🧭 Site Comparison")
+        comparison = st.session_state.comparison_data
+        site_count = len(comparison["site"].cat.categories)
+        compare_columns = [column for column in comparison.columns if column not in ("site", "time")]
+        compare_column = st.selectbox("Compare", compare_columns,
+                                      format_func=lambda column: VARIABLE_LABELS[column])
+        layout = st.radio("Layout", ["Overlaid", "Small multiples"], horizontal=True)
+        
+        def comparison_figure():
+            label = VARIABLE_LABELS[compare_column]
+            if layout == "Overlaid":
+                reduced = downsample_groups(comparison, "site", "time", [compare_column], point_budget())
+                return px.line(
+                    reduced,
+                    x="time",
+                    y=compare_column,
+                    color="site",
+                    labels={"time": "Date", compare_column: label},
+                    title=f"{label} by Site",
+                    render_mode=render_mode(reduced, [compare_column])
+                )
+            rows = math.ceil(site_count / SMALL_MULTIPLE_COLUMNS)
+            panel_budget = point_budget(DEFAULT_CHART_WIDTH_PX / SMALL_MULTIPLE_COLUMNS)
+            reduced = downsample_groups(comparison, "site", "time", [compare_column], panel_budget)
+            fig = px.line(
+                reduced,
+                x="time",
+                y=compare_column,
+                facet_col="site",
+                facet_col_wrap=SMALL_MULTIPLE_COLUMNS,
+                facet_row_spacing=min(0.04, 0.5 / rows),
+                height=max(300, 160 * rows),
+                labels={"time": "Date", compare_column: label},
+                title=f"{label} by Site",
+                render_mode=render_mode(reduced, [compare_column])
+            )
+            fig.for_each_annotation(lambda a: a.update(text=a.text.split("=", 1)[-1]))
+            return fig
+        
+        fig_compare = memoize((st.session_state.comparison_key, "figure", compare_column, layout),
+                              comparison_figure)
+        st.plotly_chart(fig_compare, use_container_width=True)
+        memory = comparison.attrs.get("memory_report")
+        if memory:
+            st.caption(f"{site_count} sites · {memory['rows']:,} rows · "
+                       f"{memory['bytes'] / 1024:.1f} KiB in memory")
+        
+        # Batch Forecast: every site x variable fit is its own task in the
+        # shared worker pool, and finished fits show up while the rest run
+        batch_targets = st.multiselect(
+            "Variables to forecast for every site",
+            options=[column for column in compare_columns if column in FORECAST_TARGETS],
+            default=[column for column in DEFAULT_TARGETS if column in compare_columns],
+            format_func=lambda column: FORECAST_TARGETS[column]
+        )
+        if st.button(f"🔮 Forecast {site_count} Sites", disabled=not batch_targets):
+            if st.session_state.batch_forecast_job is not None:
+                jobs.discard(st.session_state.batch_forecast_job)
+            release_session_frames([st.session_state.batch_forecast_key])
+            backend = st.session_state.forecast_backend
+            batch_key = (st.session_state.comparison_key, "forecast", backend, tuple(batch_targets),
+                         FORECAST_DAYS)
+            st.session_state.update({
+                "batch_forecast_key": batch_key,
+                "batch_forecast_note": None,
+                "batch_forecast_job": None,
+                "batch_forecasts": shared_cache.frames.acquire(batch_key, st.session_state.session_token)
+            })
+            if st.session_state.batch_forecasts is None:
+                st.session_state.batch_forecast_job = jobs.submit(site_forecast_tasks(
+                    comparison, batch_targets, FORECAST_DAYS, backend=backend
+                ))
+            st.rerun()
+        
+        @st.fragment(run_every=1)
+        def batch_forecast_status():
+            job = jobs.get(st.session_state.batch_forecast_job)
+            if job is None:
+                st.session_state.batch_forecast_job = None
+                return
+            finished = job.finished()
+            if not job.done():
+                st.progress(job.progress, text=(
+                    f"⏳ Fitted {len(finished)}/{len(job.futures)} models "
+                    f"({job.throughput:.2f} fits/s, {job.elapsed:.0f}s)"
+                ))
+                if job.status == "queued":
+                    st.caption("Waiting for a free worker; the pool is shared with other sessions")
+                if finished:
+                    st.dataframe(summarize_site_forecasts(finished), use_container_width=True)
+                return
+            
+            jobs.discard(job.id)
+            st.session_state.batch_forecast_job = None
+            failures = job.failures()
+            combined = combine_site_forecasts(finished)
+            note = (f"{FORECAST_BACKENDS[st.session_state.batch_forecast_key[2]]}: {len(finished)} fits "
+                    f"in {job.elapsed:.1f}s ({job.throughput:.2f} fits/s)")
+            if failures:
+                # Partial results stay private to this session
+                first_error = next(iter(failures.values()))
+                note += f"; {len(failures)} failed, e.g. {first_error}"
+                st.session_state.batch_forecasts = combined
+            else:
+                st.session_state.batch_forecasts = shared_cache.frames.put(
+                    st.session_state.batch_forecast_key, st.session_state.session_token, combined
+                )
+            st.session_state.batch_forecast_note = note
+            st.rerun()
+        
+        if st.session_state.batch_forecast_job is not None:
+            batch_forecast_status()
+        
+        if st.session_state.batch_forecasts is not None and len(st.session_state.batch_forecasts):
+            batch_forecasts = st.session_state.batch_forecasts
+            forecast_variable = st.selectbox(
+                "Forecast variable",
+                list(dict.fromkeys(batch_forecasts["variable"])),
+                format_func=lambda column: FORECAST_TARGETS[column]
+            )
+            fig_batch = memoize(
+                (st.session_state.batch_forecast_key, "figure", forecast_variable, len(batch_forecasts)),
+                lambda: px.line(
+                    batch_forecasts[batch_forecasts["variable"] == forecast_variable],
+                    x="ds",
+                    y="yhat",
+                    color="site",
+                    labels={"ds": "Date", "yhat": f"Predicted {VARIABLE_LABELS[forecast_variable]}"},
+                    title=f"{FORECAST_DAYS}-Day {FORECAST_TARGETS[forecast_variable]} Forecast by Site"
+                )
+            )
+            st.plotly_chart(fig_batch, use_container_width=True)
+        if st.session_state.batch_forecast_note:
+            st.caption(st.session_state.batch_forecast_note)
+
 # ================= Right Column (Controls + Forecast) =================
 with right_col:
     # Show help message until area is selected
@@ -97,93 +439,160 @@ with right_col:
     st.subheader("📅 Date Range Selection")
     start_date = st.date_input("Start Date", value=datetime(2023, 1, 1))
     end_date = st.date_input("End Date", value=datetime(2023, 12, 31))
+    sampling = st.radio(
+        "Location sampling",
+        ["Centroid", "Area average"],
+        horizontal=True,
+        help="Area average fetches a grid of points across the rectangle in one batched request"
+    )
+    if sampling == "Area average":
+        grid_size = st.slider("Grid points per side", min_value=2, max_value=7, value=3)
+    data_resolution = st.radio(
+        "Data resolution",
+        ["Daily", "Hourly"],
+        horizontal=True,
+        help="Hourly data is 24x larger; daily, weekly and monthly views are rolled up from it"
+    )
+    forecast_backend = st.selectbox(
+        "Forecasting model",
+        options=list(FORECAST_BACKENDS),
+        format_func=lambda backend: FORECAST_BACKENDS[backend],
+        key="forecast_backend",
+        help="Prophet takes seconds per variable; the other models fit in milliseconds"
+    )
     
     # Location Details Section
     if map_data.get("last_active_drawing"):
         st.subheader("📍 Selected Location Details")
         
-        # Calculate centroid
-        geometry = map_data["last_active_drawing"]["geometry"]
-        coordinates = geometry["coordinates"][0]
-        lats = [coord[1] for coord in coordinates]
-        lons = [coord[0] for coord in coordinates]
-        latitude = sum(lats) / len(lats)
-        longitude = sum(lons) / len(lons)
+        latitude, longitude = selection.centroid
         
         # Display coordinates
         st.write(f"**Latitude:** {latitude:.4f}")
         st.write(f"**Longitude:** {longitude:.4f}")
+        if selection.area_km2:
+            st.write(f"**Area:** {selection.area_km2:,.0f} km²")
         
-        # Reverse geocoding for address details
-        try:
-            geolocator = Nominatim(user_agent="weather_dashboard")
-            location = geolocator.reverse(f"{latitude}, {longitude}", exactly_one=True)
+        # Reverse geocoding runs in the background so the page renders at once
+        def show_address(address_future):
+            try:
+                address = address_future.result()
+                
+                if address is not None:
+                    st.write("**Address Details:**")
+                    st.write(f"📍 {address.get('road', '')} {address.get('house_number', '')}")
+                    st.write(f"🏙️ {address.get('city', address.get('town', ''))}")
+                    st.write(f"🗺️ {address.get('state', '')}, {address.get('country', '')}")
+                    st.write(f"🌐 {address.get('postcode', '')}")
+                else:
+                    st.warning("Could not retrieve address details for this location")
             
-            if location:
-                address = location.raw.get('address', {})
-                st.write("**Address Details:**")
-                st.write(f"📍 {address.get('road', '')} {address.get('house_number', '')}")
-                st.write(f"🏙️ {address.get('city', address.get('town', ''))}")
-                st.write(f"🗺️ {address.get('state', '')}, {address.get('country', '')}")
-                st.write(f"🌐 {address.get('postcode', '')}")
-            else:
-                st.warning("Could not retrieve address details for this location")
+            except Exception as e:
+                st.error(f"Error fetching location details: {str(e)}")
+                st.info("Note: Location details might not be available for remote areas")
         
-        except Exception as e:
-            st.error(f"Error fetching location details: {str(e)}")
-            st.info("Note: Location details might not be available for remote areas")
+        @st.fragment(run_every=1)
+        def pending_address(address_future):
+            if address_future.done():
+                st.rerun()
+            st.caption("🔎 Looking up address details...")
         
-        # Add delay to prevent rate limiting
-        time.sleep(1)
+        address_future = reverse_geocode_async(latitude, longitude)
+        if address_future.done():
+            show_address(address_future)
+        else:
+            pending_address(address_future)
+    
+    # Site Comparison Inputs
+    st.subheader("🧭 Compare Sites")
+    sites_text = st.text_area(
+        "Sites (one per line: name, latitude, longitude)",
+        placeholder="Colombo, 6.93, 79.85\nKandy, 7.29, 80.63",
+        height=120
+    )
+    include_drawings = st.checkbox("Include every shape drawn on the map", value=True)
+    try:
+        compare_sites = parse_sites(sites_text)
+    except ValueError as e:
+        st.error(str(e))
+        compare_sites = []
+    if include_drawings:
+        used_names = {name for name, _, _ in compare_sites}
+        for number, drawing in enumerate(map_data.get("all_drawings") or [], start=1):
+            compare_sites.append((unique_site_name(f"Shape {number}", used_names),
+                                  *selection_from_drawing(drawing).centroid))
     
+    # Background Forecast Job
+    @st.fragment(run_every=1)
+    def forecast_job_status():
+        job = jobs.get(st.session_state.forecast_job)
+        if job is None:
+            st.session_state.forecast_job = None
+            return
+        if not job.done():
+            finished = round(job.progress * len(job.futures))
+            st.progress(job.progress, text=(
+                f"⏳ Training forecast models: {finished}/{len(job.futures)} done "
+                f"({job.elapsed:.0f}s)"
+            ))
+            if job.status == "queued":
+                st.caption("Waiting for a free worker; the pool is shared with other sessions")
+            return
+
+        jobs.discard(job.id)
+        st.session_state.forecast_job = None
+        try:
+            results = job.result()
+            forecast_keys = [
+                (st.session_state.historical_key, "forecast", st.session_state.forecast_job_backend,
+                 column, FORECAST_DAYS)
+                for column in results
+            ]
+            # Replaced forecasts stop pinning their shared entries
+            release_session_frames(st.session_state.forecast_keys)
+            st.session_state.forecasts = {
+                column: shared_cache.frames.put(key, st.session_state.session_token, forecast)
+                for key, (column, forecast) in zip(forecast_keys, results.items())
+            }
+            st.session_state.forecast_keys = forecast_keys
+        except Exception as e:
+            st.session_state.forecast_error = str(e)
+        st.rerun()
+
+    if st.session_state.forecast_job is not None:
+        forecast_job_status()
+    if st.session_state.forecast_error:
+        st.error(f"Prediction failed: {st.session_state.forecast_error}")
+
     # Prediction Section
-    if st.session_state.forecast_temp is not None and st.session_state.forecast_precip is not None:
+    if st.session_state.forecasts:
         st.subheader("🔮 Future Weather Forecast")
+        st.caption(f"Model: {FORECAST_BACKENDS[st.session_state.forecast_keys[0][2]]}")
         
-        fc_tab1, fc_tab2 = st.tabs(["Temperature Forecast", "Precipitation Forecast"])
-        
-        with fc_tab1:
-            # Temperature forecast
-            forecast_temp_df = st.session_state.forecast_temp.rename(columns={
-                "ds": "Date",
-                "yhat": "Predicted Temperature (°C)",
-                "yhat_lower": "Min Temp",
-                "yhat_upper": "Max Temp"
-            })
-            last_date = pd.to_datetime(st.session_state.historical_data["time"].max())
-            future_temp = forecast_temp_df[forecast_temp_df["Date"] > last_date]
-            
-            st.dataframe(future_temp[["Date", "Predicted Temperature (°C)"]], 
-                        use_container_width=True)
-            
-            fig_temp = px.line(
-                future_temp,
-                x="Date",
-                y="Predicted Temperature (°C)",
-                title="30-Day Temperature Forecast"
-            )
-            st.plotly_chart(fig_temp, use_container_width=True)
+        fc_tabs = st.tabs([f"{FORECAST_TARGETS[column]} Forecast" for column in st.session_state.forecasts])
         
-        with fc_tab2:
-            # Precipitation forecast
-            forecast_precip_df = st.session_state.forecast_precip.rename(columns={
-                "ds": "Date",
-                "yhat": "Predicted Precipitation (mm)",
-                "yhat_lower": "Min Precip",
-                "yhat_upper": "Max Precip"
-            })
-            future_precip = forecast_precip_df[forecast_precip_df["Date"] > last_date]
-            
-            st.dataframe(future_precip[["Date", "Predicted Precipitation (mm)"]], 
-                        use_container_width=True)
-            
-            fig_precip = px.line(
-                future_precip,
-                x="Date",
-                y="Predicted Precipitation (mm)",
-                title="30-Day Precipitation Forecast"
-            )
-            st.plotly_chart(fig_precip, use_container_width=True)
+        forecast_items = zip(fc_tabs, st.session_state.forecast_keys, st.session_state.forecasts.items())
+        for fc_tab, forecast_key, (column, forecast) in forecast_items:
+            with fc_tab:
+                predicted_label = f"Predicted {VARIABLE_LABELS[column]}"
+                forecast_df = memoize((forecast_key, "display"), lambda: forecast.rename(columns={
+                    "ds": "Date",
+                    "yhat": predicted_label,
+                    "yhat_lower": "Lower Bound",
+                    "yhat_upper": "Upper Bound"
+                }))
+                
+                st.dataframe(forecast_df[["Date", predicted_label]], 
+                            use_container_width=True)
+                
+                fig_forecast = memoize((forecast_key, "figure"), lambda: px.line(
+                    forecast_df,
+                    x="Date",
+                    y=predicted_label,
+                    title=f"{FORECAST_DAYS}-Day {FORECAST_TARGETS[column]} Forecast",
+                    render_mode=render_mode(forecast_df, [predicted_label])
+                ))
+                st.plotly_chart(fig_forecast, use_container_width=True)
 
 # ================= Chatbot Section =================
 st.sidebar.title("💬 Weather Chatbot")
@@ -198,21 +607,18 @@ def get_data_summary():
     if st.session_state.historical_data is not None:
         hist_df = st.session_state.historical_data
         summary.append("Historical Weather Data:")
-        summary.append(f"- Date Range: {hist_df['time'].min()} to {hist_df['time'].max()}")
+        summary.append(f"- Date Range: {hist_df['time'].min():%Y-%m-%d} to {hist_df['time'].max():%Y-%m-%d}")
         summary.append(f"- Avg Max Temp: {hist_df['temperature_2m_max'].mean():.1f}°C")
         summary.append(f"- Avg Min Temp: {hist_df['temperature_2m_min'].mean():.1f}°C")
         summary.append(f"- Total Precipitation: {hist_df['precipitation_sum'].sum()}mm")
     
-    if st.session_state.forecast_temp is not None:
-        forecast_df = st.session_state.forecast_temp
-        summary.append("\nTemperature Forecast:")
-        summary.append(f"- Predicted Avg Temp: {forecast_df['yhat'].mean():.1f}°C")
-        summary.append(f"- Max Predicted Temp: {forecast_df['yhat'].max():.1f}°C")
-    
-    if st.session_state.forecast_precip is not None:
-        precip_df = st.session_state.forecast_precip
-        summary.append("\nPrecipitation Forecast:")
-        summary.append(f"- Total Predicted Precipitation: {precip_df['yhat'].sum()}mm")
+    for column, forecast_df in (st.session_state.forecasts or {}).items():
+        label = VARIABLE_LABELS[column]
+        summary.append(f"\n{FORECAST_TARGETS[column]} Forecast:")
+        summary.append(f"- Predicted Avg {label}: {forecast_df['yhat'].mean():.1f}")
+        summary.append(f"- Max Predicted {label}: {forecast_df['yhat'].max():.1f}")
+        if column.endswith("_sum"):
+            summary.append(f"- Total Predicted {label}: {forecast_df['yhat'].sum():.1f}")
     
     return "\n".join(summary) if summary else "No data available"
 
@@ -269,64 +675,136 @@ for message in st.session_state.chat_history:
     else:
         st.sidebar.text_area("Chatbot", value=message["content"], height=100, key=f"assistant_{message['content']}")
 
-# ================= Common Functions =================
-def fetch_weather_data(latitude, longitude):
-    url = "https://archive-api.open-meteo.com/v1/archive"
-    params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "start_date": start_date.strftime("%Y-%m-%d"),
-        "end_date": end_date.strftime("%Y-%m-%d"),
-        "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum,rain_sum,windspeed_10m_max",
-        "timezone": "auto"
-    }
-    response = requests.get(url, params=params)
-    return pd.DataFrame(response.json()["daily"])
+# ================= Network Stats =================
+with st.sidebar.expander("📶 API Latency"):
+    host_stats = latency_stats()
+    if host_stats:
+        st.table(host_stats)
+    else:
+        st.caption("No outbound requests yet")
+    cache_stats = shared_cache.frames.stats()
+    st.caption(f"Shared frames: {cache_stats['entries']} entries · "
+               f"{cache_stats['bytes'] / 1024 ** 2:.1f}/{cache_stats['max_bytes'] / 1024 ** 2:.0f} MiB · "
+               f"{cache_stats['holders']} session references")
+
+# ================= Site Comparison Controls =================
+# Every site is fetched in one call, so they share multi-location requests
+# and the bounded download pool instead of one site per click
+if right_col.button(f"📊 Compare {len(compare_sites)} Sites", disabled=len(compare_sites) < 2):
+    resolution = data_resolution.lower()
+    comparison_key = (
+        dataset_key("sites", [(lat, lon) for _, lat, lon in compare_sites], start_date, end_date, resolution),
+        tuple(name for name, _, _ in compare_sites)
+    )
+    compare_bar = right_col.progress(0.0, text="Checking local weather store...")
+    release_session_frames([st.session_state.comparison_key, st.session_state.batch_forecast_key])
+    if st.session_state.batch_forecast_job is not None:
+        jobs.discard(st.session_state.batch_forecast_job)
+    st.session_state.update({
+        "batch_forecast_job": None,
+        "batch_forecast_key": None,
+        "batch_forecasts": None,
+        "batch_forecast_note": None
+    })
+    st.session_state.comparison_data = shared_cache.frames.acquire(
+        comparison_key,
+        st.session_state.session_token,
+        lambda: fetch_sites(compare_sites, start_date, end_date, lambda done, total: compare_bar.progress(
+            done / total, text=f"Downloaded {done}/{total} chunks"
+        ), resolution)
+    )
+    st.session_state.comparison_key = comparison_key
+    st.rerun()
 
 # ================= Button Controls =================
 if map_data.get("last_active_drawing"):
-    # Calculate centroid
-    geometry = map_data["last_active_drawing"]["geometry"]
-    coordinates = geometry["coordinates"][0]
-    lats = [coord[1] for coord in coordinates]
-    lons = [coord[0] for coord in coordinates]
-    latitude = sum(lats) / len(lats)
-    longitude = sum(lons) / len(lons)
+    latitude, longitude = selection.centroid
+    
+    def fetch_selection(progress):
+        resolution = data_resolution.lower()
+        if sampling == "Area average":
+            grid = selection.sample_grid(grid_size)
+            key = dataset_key("area", grid, start_date, end_date, resolution)
+            loader = lambda: fetch_area_weather(grid, start_date, end_date, progress, resolution)
+        else:
+            key = dataset_key("point", [(latitude, longitude)], start_date, end_date, resolution)
+            loader = lambda: fetch_weather_data(latitude, longitude, start_date, end_date,
+                                                progress, resolution)
+        
+        release_session_frames()
+        if st.session_state.forecast_job is not None:
+            jobs.discard(st.session_state.forecast_job)
+        # Sessions asking for the same location and range share one frame
+        data = shared_cache.frames.acquire(key, st.session_state.session_token, loader)
+        st.session_state.update({
+            "forecasts": None,
+            "forecast_keys": [],
+            "rollup_keys": [],
+            "forecast_job": None
+        })
+        if resolution == "hourly":
+            # Forecasts, the chatbot and the daily view work on the daily rollup
+            st.session_state.update({"hourly_data": data, "hourly_key": key})
+            st.session_state.update({
+                "historical_data": rollup_frame("daily"),
+                "historical_key": (key, "rollup", "daily")
+            })
+        else:
+            st.session_state.update({
+                "historical_data": data,
+                "historical_key": key,
+                "hourly_data": None,
+                "hourly_key": None
+            })
     
     # Buttons at bottom
-    left_col.button("🗓️ Fetch Historical Data", 
-                  on_click=lambda: st.session_state.update({
-                      "historical_data": fetch_weather_data(latitude, longitude),
-                      "forecast_temp": None,
-                      "forecast_precip": None
-                  }))
+    if left_col.button("🗓️ Fetch Historical Data"):
+        download_bar = left_col.progress(0.0, text="Checking local weather store...")
+        fetch_selection(lambda done, total: download_bar.progress(
+            done / total, text=f"Downloaded {done}/{total} chunks"
+        ))
+        st.rerun()
     
-    # Modified prediction button
-    if right_col.button("🔮 Predict Next 30 Days"):
+    forecast_targets = right_col.multiselect(
+        "Variables to forecast",
+        options=list(FORECAST_TARGETS),
+        default=DEFAULT_TARGETS,
+        format_func=lambda column: FORECAST_TARGETS[column]
+    )
+    
+    # Each target is fitted as its own task in the background worker pool
+    if right_col.button("🔮 Predict Next 30 Days", disabled=not forecast_targets):
         if st.session_state.historical_data is not None:
-            try:
-                # Temperature model
-                df_temp = (st.session_state.historical_data
-                          .rename(columns={"time": "ds", "temperature_2m_max": "y"})
-                          [["ds", "y"]])
-                model_temp = Prophet()
-                model_temp.fit(df_temp)
-                
-                # Precipitation model
-                df_precip = (st.session_state.historical_data
-                            .rename(columns={"time": "ds", "precipitation_sum": "y"})
-                            [["ds", "y"]])
-                model_precip = Prophet()
-                model_precip.fit(df_precip)
-                
-                # Generate future dates
-                future = model_temp.make_future_dataframe(periods=30)
-                
-                # Make predictions
-                st.session_state.forecast_temp = model_temp.predict(future)
-                st.session_state.forecast_precip = model_precip.predict(future)
-                
-            except Exception as e:
-                st.error(f"Prediction failed: {str(e)}")
+            if st.session_state.forecast_job is not None:
+                jobs.discard(st.session_state.forecast_job)
+            st.session_state.forecast_error = None
+            
+            # Reuse forecasts another session already made for this data
+            token = st.session_state.session_token
+            forecast_keys = [
+                (st.session_state.historical_key, "forecast", forecast_backend, column, FORECAST_DAYS)
+                for column in forecast_targets
+            ]
+            # Only take references once every target is cached, so partial
+            # hits do not pin entries this session never uses
+            shared = None
+            if all(shared_cache.frames.contains(key) for key in forecast_keys):
+                shared = [shared_cache.frames.acquire(key, token) for key in forecast_keys]
+            if shared and all(forecast is not None for forecast in shared):
+                # Keys shared with the new set were re-acquired above and stay held
+                release_session_frames([key for key in st.session_state.forecast_keys
+                                        if key not in forecast_keys])
+                st.session_state.forecasts = dict(zip(forecast_targets, shared))
+                st.session_state.forecast_keys = forecast_keys
+            else:
+                if shared:
+                    # An entry was evicted between the check and the acquire
+                    release_session_frames(forecast_keys)
+                st.session_state.forecast_job = jobs.submit(forecast_tasks(
+                    st.session_state.historical_data, forecast_targets, FORECAST_DAYS,
+                    backend=forecast_backend
+                ))
+                st.session_state.forecast_job_backend = forecast_backend
+            st.rerun()
         else:
-            st.warning("Please fetch historical data first!")
\ No newline at end of file
+            st.warning("Please fetch historical data first!")
@@ -0,0 +1,73 @@
+"""Compare Plotly figure build and serialization time for SVG and WebGL
+
+Run from the repository root:
+
+    python benchmarks/bench_charts.py [--sizes 1000 10000 100000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from charts import downsample, point_budget  # noqa: E402
+
+
+def sample_frame(rows):
+    """Hourly-looking temperature series with noise"""
+    hours = np.arange(rows)
+    rng = np.random.default_rng(0)
+    daily_cycle = 8 * np.sin(2 * np.pi * hours / 24)
+    return pd.DataFrame({
+        "Date": pd.date_range("2000-01-01", periods=rows, freq="h"),
+        "Max Temperature (°C)": (15 + daily_cycle + rng.normal(0, 2, rows)).astype("float32"),
+        "Min Temperature (°C)": (5 + daily_cycle + rng.normal(0, 2, rows)).astype("float32")
+    })
+
+
+def best_of(repeat, func):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def bench(rows, mode, repeat, reduce):
+    frame = sample_frame(rows)
+    columns = list(frame.columns[1:])
+    if reduce:
+        frame = downsample(frame, "Date", columns, point_budget())
+    build, fig = best_of(repeat, lambda: px.line(frame, x="Date", y=columns, render_mode=mode))
+    serialize, payload = best_of(repeat, fig.to_json)
+    return {
+        "rows": rows,
+        "mode": mode + (" + downsample" if reduce else ""),
+        "build_ms": build * 1000,
+        "json_ms": serialize * 1000,
+        "json_kib": len(payload) / 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 500_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9}  {'mode':<18} {'build ms':>9} {'json ms':>9} {'json KiB':>10}")
+    for rows in args.sizes:
+        for mode, reduce in (("svg", False), ("webgl", False), ("webgl", True)):
+            result = bench(rows, mode, args.repeat, reduce)
+            print(f"{result['rows']:>9,}  {result['mode']:<18} {result['build_ms']:>9.1f} "
+                  f"{result['json_ms']:>9.1f} {result['json_kib']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
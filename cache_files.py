@@ -0,0 +1,39 @@
+import os
+import tempfile
+
+# On-disk caches live under .cache/ next to the app unless their
+# environment variable points elsewhere.
+CACHE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+
+def cache_dir(env_var, name):
+    """Directory named by env_var, defaulting to .cache/<name>"""
+    return os.environ.get(env_var, os.path.join(CACHE_ROOT, name))
+
+
+def atomic_write(path, write):
+    """Create path by calling write(tmp_path) and renaming the result into place
+
+    Readers, in other processes too, see either the old file or the new
+    one, never a partial write. The temporary file is removed on failure.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write_text(path, text):
+    """Atomically write a UTF-8 text file"""
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    atomic_write(path, write)
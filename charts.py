@@ -0,0 +1,177 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import shared_cache
+
+# Charts are drawn in half of a wide layout; a couple of points per pixel is
+# as much detail as the browser can show.
+DEFAULT_CHART_WIDTH_PX = 700
+POINTS_PER_PIXEL = 2
+# SVG traces slow the browser down well before this many points; above it
+# line charts are drawn with WebGL (scattergl) instead
+WEBGL_THRESHOLD = 2000
+# Figures and display frames memoised across reruns and sessions, bounded
+# by their approximate size like the shared frame cache they derive from
+MEMO_MAX_BYTES = int(os.environ.get("CHART_MEMO_MAX_BYTES", 128 * 1024 * 1024))
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def point_budget(width_px=DEFAULT_CHART_WIDTH_PX, points_per_pixel=POINTS_PER_PIXEL):
+    """Maximum number of points worth sending for a chart of this width"""
+    return int(width_px * points_per_pixel)
+
+
+def render_mode(frame, columns, threshold=WEBGL_THRESHOLD):
+    """Plotly Express render mode for plotting columns of frame as lines"""
+    return "webgl" if len(frame) * len(columns) > threshold else "svg"
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = values.astype("datetime64[ns]").astype(np.int64)
+    return values.astype(np.float64)
+
+
+def lttb_indices(x, y, n_out):
+    """Indices kept by Largest-Triangle-Three-Buckets downsampling
+
+    Keeps the first and last points and, from each bucket in between, the
+    point forming the largest triangle with the previous pick and the next
+    bucket's average, which preserves the visual shape of a line.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = _as_float(x)
+    y = _as_float(y)
+    if np.isnan(y).any():
+        # Gaps would make every triangle area NaN; rank them as flat instead
+        y = np.where(np.isnan(y), np.nanmean(y) if not np.isnan(y).all() else 0.0, y)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        next_start = end
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_end = max(next_end, next_start + 1)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return np.unique(selected)
+
+
+def minmax_indices(y, n_buckets):
+    """Indices of each bucket's minimum and maximum, fully vectorised
+
+    Suited to bars and spiky series where the extremes matter more than
+    the shape between them.
+    """
+    n = len(y)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+    y = _as_float(y)
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)[:-1]
+    sizes = np.diff(np.append(edges, n))
+    bucket = np.repeat(np.arange(len(edges)), sizes)
+
+    picks = []
+    for reducer in (np.fmin, np.fmax):
+        extreme = np.repeat(reducer.reduceat(y, edges), sizes)
+        hits = np.flatnonzero(y == extreme)
+        # First hit per bucket; all-NaN buckets have no hit and are skipped
+        _, first = np.unique(bucket[hits], return_index=True)
+        picks.append(hits[first])
+    return np.unique(np.concatenate(picks))
+
+
+def downsample(frame, x, columns, max_points, method="lttb"):
+    """Reduce frame to roughly max_points rows for charting
+
+    Frames already within budget are returned unchanged, so zoomed-in
+    windows are drawn at full resolution. With several columns the kept
+    rows are the union of each column's picks.
+    """
+    if len(frame) <= max_points:
+        return frame
+    per_column = max(3, max_points // len(columns))
+    keep = []
+    for column in columns:
+        values = frame[column].to_numpy()
+        if method == "minmax":
+            keep.append(minmax_indices(values, per_column // 2))
+        else:
+            keep.append(lttb_indices(frame[x].to_numpy(), values, per_column))
+    return frame.iloc[np.unique(np.concatenate(keep))]
+
+
+def downsample_groups(frame, by, x, columns, max_points, method="lttb"):
+    """Downsample each group of a long frame (e.g. each site) separately"""
+    parts = [
+        downsample(group, x, columns, max_points, method)
+        for _, group in frame.groupby(by, observed=True, sort=False)
+    ]
+    return pd.concat(parts) if parts else frame
+
+
+def _value_bytes(value):
+    """Rough size of a memoised frame, figure or tuple of them"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (tuple, list)):
+        return sum(_value_bytes(item) for item in value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    # Plotly figures: count the arrays their traces hold
+    traces = getattr(value, "data", None)
+    if isinstance(traces, tuple):
+        return sum(np.asarray(trace[axis]).nbytes
+                   for trace in traces for axis in ("x", "y") if trace[axis] is not None)
+    return 0
+
+
+def memoize(key, build):
+    """Return the object built for key, calling build() only on first use
+
+    key[0] must be the shared-cache key of the frame the object is built
+    from, followed by every view parameter. Frames never change under their
+    shared-cache key, and entries are dropped when that frame is evicted,
+    so a refetch under the same key is never served stale results. Results
+    are shared between sessions and must be treated as read-only.
+    """
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            return _memo[key][0]
+    value = build()
+    size = _value_bytes(value)
+    with _memo_lock:
+        value, _ = _memo.setdefault(key, (value, size))
+        _memo.move_to_end(key)
+        total = sum(size for _, size in _memo.values())
+        while total > MEMO_MAX_BYTES and len(_memo) > 1:
+            _, (_, size) = _memo.popitem(last=False)
+            total -= size
+    return value
+
+
+def forget(source_key):
+    """Drop everything memoised from the frame cached under source_key"""
+    with _memo_lock:
+        for key in [key for key in _memo if key[0] == source_key]:
+            del _memo[key]
+
+
+shared_cache.frames.on_evict(forget)
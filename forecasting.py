@@ -0,0 +1,149 @@
+import pandas as pd
+from prophet import Prophet
+
+import model_cache
+from forecasters import Climatology, Forecaster, FourierRidge, SeasonalNaive
+
+FORECAST_DAYS = 30
+# Daily variables that can be forecast, with the name used in tab titles
+FORECAST_TARGETS = {
+    "temperature_2m_max": "Max Temperature",
+    "temperature_2m_min": "Min Temperature",
+    "precipitation_sum": "Precipitation",
+    "rain_sum": "Rain",
+    "windspeed_10m_max": "Max Wind Speed"
+}
+DEFAULT_TARGETS = ["temperature_2m_max", "precipitation_sum"]
+# Keyword arguments passed to Prophet(); part of the model cache key
+PROPHET_PARAMS = {}
+# Forecasting backends, with the name shown in the model selector
+FORECAST_BACKENDS = {
+    "prophet": "Prophet",
+    "fourier_ridge": "Fourier ridge regression",
+    "climatology": "Day-of-year climatology",
+    "seasonal_naive": "Seasonal naive"
+}
+DEFAULT_BACKEND = "prophet"
+# Prediction columns kept from Prophet's much wider output frame
+FORECAST_COLUMNS = ["ds", "yhat", "yhat_lower", "yhat_upper"]
+
+
+def training_frame(historical_data, column):
+    """Shape one weather variable into Prophet's ds/y layout"""
+    return historical_data.rename(columns={"time": "ds", column: "y"})[["ds", "y"]]
+
+
+def fit_model(training_data, params=None):
+    """Return a fitted Prophet model, reusing a cached fit when possible"""
+    params = PROPHET_PARAMS if params is None else params
+    key = model_cache.model_key(training_data, params)
+    model = model_cache.load(key)
+    if model is None:
+        model = Prophet(**params)
+        model.fit(training_data)
+        model_cache.store(key, model)
+    return model
+
+
+def predict_horizon(model, periods=FORECAST_DAYS):
+    """Predict only the days after the training history"""
+    future = model.make_future_dataframe(periods=periods, include_history=False)
+    return model.predict(future)[FORECAST_COLUMNS]
+
+
+def predict_in_sample(model):
+    """Predict over the training history, e.g. to inspect the fit"""
+    return model.predict(model.history[["ds"]])[FORECAST_COLUMNS]
+
+
+class ProphetForecaster(Forecaster):
+    """Prophet behind the Forecaster interface, with cached fits"""
+
+    def __init__(self, params=None):
+        self.params = PROPHET_PARAMS if params is None else params
+
+    def fit(self, training_data):
+        # Prophet gives its own intervals, so the residual spread is skipped
+        self.training_data = training_data
+        self._fit()
+        return self
+
+    def _fit(self):
+        self.model = fit_model(self.training_data, self.params)
+
+    def _predict(self, ds):
+        return self.model.predict(pd.DataFrame({"ds": ds}))["yhat"].to_numpy()
+
+    def predict_horizon(self, periods):
+        return predict_horizon(self.model, periods)
+
+    def predict_in_sample(self):
+        return predict_in_sample(self.model)
+
+
+_BACKEND_CLASSES = {
+    "prophet": ProphetForecaster,
+    "fourier_ridge": FourierRidge,
+    "climatology": Climatology,
+    "seasonal_naive": SeasonalNaive
+}
+
+
+def make_forecaster(backend=DEFAULT_BACKEND, params=None):
+    """Return an unfitted forecaster for a FORECAST_BACKENDS name"""
+    return _BACKEND_CLASSES[backend](params)
+
+
+def forecast_target(historical_data, column, periods=FORECAST_DAYS, params=None, in_sample=False,
+                    backend=DEFAULT_BACKEND):
+    """Fit a model for one variable and predict the forecast horizon
+
+    With in_sample=True the in-sample fit over the history is returned
+    instead. Runs inside a worker process, so it only takes and returns
+    picklable pandas objects.
+    """
+    forecaster = make_forecaster(backend, params).fit(training_frame(historical_data, column))
+    if in_sample:
+        return forecaster.predict_in_sample()
+    return forecaster.predict_horizon(periods)
+
+
+def forecast_tasks(historical_data, targets, periods=FORECAST_DAYS, params=None, backend=DEFAULT_BACKEND):
+    """Build one independent task per target for jobs.submit"""
+    return {
+        column: (forecast_target, (historical_data, column, periods, params, False, backend))
+        for column in targets
+    }
+
+
+def site_forecast_tasks(sites_data, targets, periods=FORECAST_DAYS, params=None, backend=DEFAULT_BACKEND):
+    """Build one task per (site, target) from a long frame with a site column
+
+    Each task only carries its own site's time and target columns, which
+    keeps the data pickled to the worker processes small.
+    """
+    tasks = {}
+    for site, rows in sites_data.groupby("site", observed=True, sort=False):
+        rows = rows.reset_index(drop=True)
+        for column in targets:
+            tasks[(site, column)] = (forecast_target, (rows[["time", column]], column, periods, params,
+                                                       False, backend))
+    return tasks
+
+
+def combine_site_forecasts(results):
+    """Stack {(site, column): forecast} results into one long frame"""
+    frames = [
+        forecast.assign(site=site, variable=column)
+        for (site, column), forecast in results.items()
+    ]
+    if not frames:
+        return pd.DataFrame(columns=["site", "variable"] + FORECAST_COLUMNS)
+    return pd.concat(frames, ignore_index=True)[["site", "variable"] + FORECAST_COLUMNS]
+
+
+def summarize_site_forecasts(results):
+    """Mean predicted value per site (rows) and variable (columns)"""
+    combined = combine_site_forecasts(results)
+    summary = combined.groupby(["site", "variable"], sort=False)["yhat"].mean().unstack()
+    return summary.rename(columns=FORECAST_TARGETS)
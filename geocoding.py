@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import http_client
+from cache_files import atomic_write_text, cache_dir
+
+# Reverse geocoding results keyed on rounded coordinates. Addresses rarely
+# change, so entries never expire.
+CACHE_DIR = cache_dir("GEOCODE_CACHE_DIR", "geocode")
+COORD_PRECISION = 3  # ~100 m
+# Nominatim's usage policy allows at most one request per second
+REQUESTS_PER_SECOND = 1.0
+REVERSE_URL = "https://nominatim.openstreetmap.org/reverse"
+USER_AGENT = "weather_dashboard"
+# Failed lookups are remembered this long before a rerun may retry them
+RETRY_AFTER_SECONDS = 30
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every session in the process"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_rate_limiter = TokenBucket(REQUESTS_PER_SECOND)
+# Lookups run off the script thread; in-flight ones are shared by key
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="geocode")
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def _key(latitude, longitude):
+    rounded = f"{round(float(latitude), COORD_PRECISION)},{round(float(longitude), COORD_PRECISION)}"
+    return hashlib.sha256(rounded.encode("utf-8")).hexdigest()
+
+
+def _path(key):
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+
+def _load(key):
+    try:
+        with open(_path(key), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _store(key, entry):
+    atomic_write_text(_path(key), json.dumps(entry))
+
+
+def reverse_geocode(latitude, longitude):
+    """Return the address dict for a point, or None if there is none
+
+    Cache hits return immediately; misses wait for the shared rate limiter
+    before calling Nominatim.
+    """
+    latitude = round(float(latitude), COORD_PRECISION)
+    longitude = round(float(longitude), COORD_PRECISION)
+    key = _key(latitude, longitude)
+    entry = _load(key)
+    if entry is None:
+        # Retries wait for the limiter too, so a 429 never breaks the 1 req/s policy
+        response = http_client.get(REVERSE_URL, params={
+            "lat": latitude,
+            "lon": longitude,
+            "format": "jsonv2",
+            "addressdetails": 1
+        }, headers={"User-Agent": USER_AGENT}, before_attempt=_rate_limiter.acquire)
+        location = response.json()
+        # Misses are cached too, so remote areas are not looked up again
+        entry = {"address": location.get("address", {}) if "error" not in location else None}
+        _store(key, entry)
+    return entry["address"]
+
+
+def reverse_geocode_async(latitude, longitude):
+    """Start a reverse geocode in the background and return its Future
+
+    Cache hits come back as an already completed Future, and concurrent
+    requests for the same point share a single lookup.
+    """
+    key = _key(latitude, longitude)
+    entry = _load(key)
+    if entry is not None:
+        future = Future()
+        future.set_result(entry["address"])
+        return future
+
+    with _pending_lock:
+        future = _pending.get(key)
+        if future is None:
+            future = _executor.submit(reverse_geocode, latitude, longitude)
+            _pending[key] = future
+    # Outside the lock: the callback runs inline if the lookup already finished
+    future.add_done_callback(lambda f: _forget(key, f))
+    return future
+
+
+def _forget(key, future):
+    """Drop a finished lookup, keeping failures around to avoid retry storms"""
+    if future.exception() is None:
+        _pending.pop(key, None)
+    else:
+        timer = threading.Timer(RETRY_AFTER_SECONDS, _pending.pop, (key, None))
+        timer.daemon = True
+        timer.start()
@@ -0,0 +1,170 @@
+import json
+from functools import lru_cache
+
+import numpy as np
+
+# Areas use a local equirectangular projection, accurate to well under 1%
+# for the few-degree rectangles drawn on the map.
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = EARTH_RADIUS_KM * np.pi / 180
+
+
+def _polygons(geometry):
+    """GeoJSON geometry as a list of polygons, each a list of [lon, lat] rings"""
+    kind, coordinates = geometry["type"], geometry["coordinates"]
+    if kind == "Polygon":
+        return [coordinates]
+    if kind == "MultiPolygon":
+        return coordinates
+    return []
+
+
+def _open_ring(ring):
+    ring = np.asarray(ring, dtype=float)[:, :2]
+    # GeoJSON rings repeat the first vertex at the end; counting it twice
+    # skews vertex averages towards that corner
+    if len(ring) > 1 and np.array_equal(ring[0], ring[-1]):
+        ring = ring[:-1]
+    return ring
+
+
+class Selection:
+    """A drawn area parsed once: bounding box, centroid, area and sampling"""
+
+    def __init__(self, geometry):
+        rings, signs = [], []
+        for polygon in _polygons(geometry):
+            for i, ring in enumerate(polygon):
+                rings.append(_open_ring(ring))
+                # The first ring is the outline, any others are holes
+                signs.append(1.0 if i == 0 else -1.0)
+
+        if rings:
+            vertices = np.concatenate(rings)
+        else:
+            # Markers and lines have no area; use their vertices as-is
+            vertices = np.asarray(geometry["coordinates"], dtype=float).reshape(-1, 2)
+        lon_min, lat_min = vertices.min(axis=0)
+        lon_max, lat_max = vertices.max(axis=0)
+        self.bbox = (float(lat_min), float(lon_min), float(lat_max), float(lon_max))
+        self._rings = rings
+        self._signs = np.asarray(signs)
+        self._vertices = vertices
+
+        areas, centroids = self._ring_moments((lat_min + lat_max) / 2)
+        weights = self._signs * np.abs(areas)
+        total = weights.sum() if len(weights) else 0.0
+        if total > 0:
+            lon, lat = (weights[:, None] * centroids).sum(axis=0) / total
+        else:
+            lon, lat = vertices.mean(axis=0)
+        self.centroid = (float(lat), float(lon))
+        self.area_km2 = float(max(total, 0.0))
+
+    def _ring_moments(self, reference_lat):
+        """Signed shoelace area (km^2) and centroid (lon, lat) of every ring at once"""
+        if not self._rings:
+            return np.empty(0), np.empty((0, 2))
+        sizes = np.array([len(ring) for ring in self._rings])
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        x, y = self._vertices[:, 0], self._vertices[:, 1]
+        # Index of each vertex's successor, wrapping around within its ring
+        following = np.arange(len(x)) + 1
+        following[starts + sizes - 1] = starts
+        cross = x * y[following] - x[following] * y
+        area = np.add.reduceat(cross, starts) / 2
+        cx = np.add.reduceat((x + x[following]) * cross, starts)
+        cy = np.add.reduceat((y + y[following]) * cross, starts)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            centroids = np.column_stack([cx, cy]) / (6 * area[:, None])
+        # Degenerate rings fall back to their vertex average
+        flat = np.isclose(area, 0)
+        if flat.any():
+            means = np.column_stack([np.add.reduceat(x, starts), np.add.reduceat(y, starts)]) / sizes[:, None]
+            centroids[flat] = means[flat]
+        scale = KM_PER_DEGREE ** 2 * np.cos(np.radians(reference_lat))
+        return area * scale, centroids
+
+    def contains(self, lats, lons):
+        """Even-odd test of many points against every ring, vectorised"""
+        lats = np.asarray(lats, dtype=float)[:, None]
+        lons = np.asarray(lons, dtype=float)[:, None]
+        inside = np.zeros(len(lats), dtype=bool)
+        for ring in self._rings:
+            x0, y0 = ring[:, 0], ring[:, 1]
+            x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+            straddles = (y0 > lats) != (y1 > lats)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                crossing_x = x0 + (lats - y0) * (x1 - x0) / (y1 - y0)
+            inside ^= (np.count_nonzero(straddles & (lons < crossing_x), axis=1) % 2).astype(bool)
+        return inside
+
+    def sample_grid(self, points_per_side=3):
+        """Return grid cell centres (lat, lon) over the bbox that fall inside the shape
+
+        Shapes too thin to contain any cell centre are sampled at the
+        centroid instead, as are markers and lines.
+        """
+        if not self._rings:
+            return [self.centroid]
+        lat_min, lon_min, lat_max, lon_max = self.bbox
+        offsets = (np.arange(points_per_side) + 0.5) / points_per_side
+        grid_lat, grid_lon = np.meshgrid(lat_min + offsets * (lat_max - lat_min),
+                                         lon_min + offsets * (lon_max - lon_min), indexing="ij")
+        grid_lat, grid_lon = grid_lat.ravel(), grid_lon.ravel()
+        keep = self.contains(grid_lat, grid_lon)
+        grid_lat, grid_lon = grid_lat[keep], grid_lon[keep]
+        if not len(grid_lat):
+            return [self.centroid]
+        return list(zip(grid_lat.tolist(), grid_lon.tolist()))
+
+
+@lru_cache(maxsize=32)
+def _parse(geometry_json):
+    return Selection(json.loads(geometry_json))
+
+
+def selection_from_drawing(drawing):
+    """Selection for a GeoJSON feature from the draw tool, or None
+
+    Parsing is cached on the geometry, so every consumer in a rerun (and
+    later reruns with the same drawing) shares one Selection.
+    """
+    if not drawing:
+        return None
+    return _parse(json.dumps(drawing["geometry"], sort_keys=True))
+
+
+def unique_site_name(name, used):
+    """Return name, suffixed " (2)", " (3)"... until not in used, and record it
+
+    A suffixed name can itself be taken (e.g. "A", "A", "A (2)"), so the
+    suffix keeps counting until the name is free.
+    """
+    candidate, suffix = name, 1
+    while candidate in used:
+        suffix += 1
+        candidate = f"{name} ({suffix})"
+    used.add(candidate)
+    return candidate
+
+
+def parse_sites(text):
+    """Parse "name, latitude, longitude" lines into (name, lat, lon) tuples
+
+    Blank lines are skipped and repeated names get a numeric suffix.
+    Raises ValueError naming the first malformed line.
+    """
+    sites, used = [], set()
+    for number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        parts = [part.strip() for part in line.rsplit(",", 2)]
+        try:
+            name, lat, lon = parts[0], float(parts[1]), float(parts[2])
+        except (IndexError, ValueError):
+            raise ValueError(f"Line {number}: expected 'name, latitude, longitude'") from None
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f"Line {number}: coordinates out of range")
+        sites.append((unique_site_name(name or f"Site {len(sites) + 1}", used), lat, lon))
+    return sites
@@ -0,0 +1,149 @@
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# One pooled session is shared by every outbound call in the process, so
+# connections (and their TLS handshakes) are reused across reruns and users.
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 60
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 20
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+POOL_SIZE = 16
+# Concurrent in-flight requests allowed per host
+DEFAULT_HOST_LIMIT = 4
+HOST_LIMITS = {
+    "nominatim.openstreetmap.org": 1
+}
+# Floor on the retry delay for hosts with a strict request-rate policy
+HOST_MIN_BACKOFF = {
+    "nominatim.openstreetmap.org": 1
+}
+LATENCY_SAMPLES = 200
+
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+
+_lock = threading.Lock()
+_host_slots = {}
+_latencies = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))
+_counts = defaultdict(lambda: {"requests": 0, "retries": 0, "errors": 0})
+
+
+def _slot(host):
+    with _lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT))
+        return _host_slots[host]
+
+
+def _record(host, key, elapsed=None):
+    with _lock:
+        _counts[host][key] += 1
+        if elapsed is not None:
+            _latencies[host].append(elapsed)
+
+
+def _finish(host, slot, started):
+    _record(host, "requests", time.perf_counter() - started)
+    slot.release()
+
+
+def _release_on_close(response, host, slot, started):
+    """Keep host's slot until a streamed response is closed
+
+    The body of a streamed response is read after get() returns, so the
+    slot is held, and the request timed, until the caller closes it.
+    """
+    close = response.close
+    pending = [True]
+
+    def close_and_release():
+        try:
+            close()
+        finally:
+            with _lock:
+                release, pending[0] = pending[0], False
+            if release:
+                _finish(host, slot, started)
+
+    response.close = close_and_release
+
+
+def _backoff(host, attempt, response=None):
+    """Full-jitter exponential backoff, honouring Retry-After when given"""
+    floor = HOST_MIN_BACKOFF.get(host, 0)
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return max(floor, min(float(retry_after), BACKOFF_MAX))
+    return max(floor, random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)))
+
+
+def get(url, params=None, headers=None, timeout=None, stream=False, before_attempt=None):
+    """GET with pooling, timeouts, per-host limits and jittered retries
+
+    Retries connection errors, timeouts and 429/5xx responses; any other
+    error status is raised as requests.HTTPError. before_attempt() is
+    called before every attempt, retries included, e.g. to wait for a
+    caller's rate limiter. Streamed responses keep their host slot until
+    closed, so callers must close them, e.g. with a with block.
+    """
+    host = urlsplit(url).hostname
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    for attempt in range(MAX_RETRIES + 1):
+        response = None
+        if before_attempt is not None:
+            before_attempt()
+        slot = _slot(host)
+        slot.acquire()
+        started = time.perf_counter()
+        try:
+            response = _session.get(url, params=params, headers=headers,
+                                    timeout=timeout, stream=stream)
+        except (requests.ConnectionError, requests.Timeout):
+            slot.release()
+            _record(host, "errors")
+            if attempt == MAX_RETRIES:
+                raise
+        except BaseException:
+            slot.release()
+            raise
+        else:
+            if stream and response.ok:
+                _release_on_close(response, host, slot, started)
+            else:
+                _finish(host, slot, started)
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                if not response.ok:
+                    _record(host, "errors")
+                    # Streamed responses hold their pooled connection until closed
+                    response.close()
+                    response.raise_for_status()
+                return response
+            response.close()
+        _record(host, "retries")
+        time.sleep(_backoff(host, attempt, response))
+
+
+def latency_stats():
+    """Return per-host request counts and latency percentiles in ms"""
+    with _lock:
+        snapshot = {host: (sorted(_latencies[host]), dict(counts)) for host, counts in _counts.items()}
+    stats = []
+    for host, (samples, counts) in sorted(snapshot.items()):
+        row = {"host": host, **counts}
+        if samples:
+            row["p50_ms"] = round(samples[len(samples) // 2] * 1000, 1)
+            row["p95_ms"] = round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 1)
+            row["max_ms"] = round(samples[-1] * 1000, 1)
+        stats.append(row)
+    return stats
@@ -0,0 +1,124 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# The pool and job registry live at module level, so they are shared by all
+# Streamlit sessions in the server process and survive script reruns.
+MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+JOB_TTL_SECONDS = 60 * 60
+
+_executor = None
+_jobs = {}
+_lock = threading.Lock()
+
+
+class Job:
+    """A group of tasks submitted to the worker pool under one ID"""
+
+    def __init__(self, job_id, futures):
+        self.id = job_id
+        self.futures = futures
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.time()) - self.submitted_at
+
+    @property
+    def progress(self):
+        """Fraction of tasks that have finished"""
+        return sum(f.done() for f in self.futures.values()) / len(self.futures)
+
+    @property
+    def throughput(self):
+        """Tasks finished per second since submission"""
+        finished = sum(f.done() for f in self.futures.values())
+        return finished / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def status(self):
+        if self.done():
+            failed = any(f.exception() is not None for f in self.futures.values())
+            return "failed" if failed else "done"
+        if any(f.running() for f in self.futures.values()):
+            return "running"
+        return "queued"
+
+    def done(self):
+        done = all(f.done() for f in self.futures.values())
+        if done and self.finished_at is None:
+            self.finished_at = time.time()
+        return done
+
+    def result(self):
+        """Return task results by name; raises the first task error"""
+        return {name: f.result() for name, f in self.futures.items()}
+
+    def finished(self):
+        """Results of the tasks that have succeeded so far, by name"""
+        return {
+            name: f.result() for name, f in self.futures.items()
+            if f.done() and not f.cancelled() and f.exception() is None
+        }
+
+    def failures(self):
+        """Errors of the tasks that have failed so far, by name"""
+        return {
+            name: f.exception() for name, f in self.futures.items()
+            if f.done() and not f.cancelled() and f.exception() is not None
+        }
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # Spawned workers avoid forking the threaded Streamlit server
+        _executor = ProcessPoolExecutor(
+            max_workers=MAX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def _prune():
+    """Drop finished jobs that no session has collected"""
+    now = time.time()
+    for job_id, job in list(_jobs.items()):
+        if job.done() and now - job.finished_at > JOB_TTL_SECONDS:
+            del _jobs[job_id]
+
+
+def submit(tasks):
+    """Submit {name: (fn, args)} tasks as one job and return its ID"""
+    global _executor
+    with _lock:
+        _prune()
+        try:
+            futures = {name: _get_executor().submit(fn, *args) for name, (fn, args) in tasks.items()}
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool
+            _executor = None
+            futures = {name: _get_executor().submit(fn, *args) for name, (fn, args) in tasks.items()}
+        job_id = uuid.uuid4().hex
+        _jobs[job_id] = Job(job_id, futures)
+        return job_id
+
+
+def get(job_id):
+    """Return the job for an ID, or None if it is unknown or pruned"""
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def discard(job_id):
+    """Forget a job, cancelling any tasks that have not started"""
+    with _lock:
+        job = _jobs.pop(job_id, None)
+    if job is not None:
+        for future in job.futures.values():
+            future.cancel()
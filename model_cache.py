@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+from prophet.serialize import model_from_json, model_to_json
+
+from cache_files import atomic_write_text, cache_dir
+
+# Fitted Prophet models serialized with Prophet's own JSON format. Workers in
+# different processes read and write here, so writes go through os.replace.
+CACHE_DIR = cache_dir("MODEL_CACHE_DIR", "models")
+MAX_CACHE_BYTES = int(os.environ.get("MODEL_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+
+
+def model_key(training_data, params):
+    """Fingerprint a training frame together with the model hyperparameters"""
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(training_data, index=False).values.tobytes())
+    digest.update(",".join(f"{c}:{t}" for c, t in training_data.dtypes.items()).encode("utf-8"))
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _path(key):
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+
+def load(key):
+    """Return the cached fitted model for a key, or None on a miss"""
+    path = _path(key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            model = model_from_json(f.read())
+    except (OSError, ValueError, KeyError):
+        return None
+    # Bump the modification time so eviction treats it as recently used
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return model
+
+
+def store(key, model):
+    """Serialize a fitted model and evict old entries if over budget"""
+    atomic_write_text(_path(key), model_to_json(model))
+    _evict()
+
+
+def _evict():
+    """Remove least recently used models until the cache fits its budget"""
+    entries = []
+    total = 0
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= MAX_CACHE_BYTES:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Frames here are shared by every Streamlit session in the server process, so
+# memory grows with the number of distinct locations rather than users.
+# Shared frames must be treated as read-only: derive new frames with
+# rename/assign/copy instead of modifying them in place.
+MAX_SHARED_BYTES = int(os.environ.get("SHARED_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# Sessions that have not touched an entry for this long no longer pin it;
+# closed browser tabs never release explicitly.
+HOLDER_TTL_SECONDS = 60 * 60
+
+
+def frame_bytes(frame):
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+
+class SharedFrameCache:
+    """Process-wide LRU of reference-counted, read-only frames"""
+
+    def __init__(self, max_bytes=MAX_SHARED_BYTES, holder_ttl=HOLDER_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.holder_ttl = holder_ttl
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def on_evict(self, listener):
+        """Call listener(key) whenever an entry is dropped, e.g. to clear derived caches"""
+        self._listeners.append(listener)
+
+    def _notify(self, keys):
+        # Called outside the lock so listeners may use the cache
+        for key in keys:
+            for listener in self._listeners:
+                listener(key)
+
+    def _live_holders(self, entry, now):
+        return {h: seen for h, seen in entry["holders"].items() if now - seen < self.holder_ttl}
+
+    def _hold(self, key, holder):
+        entry = self._entries[key]
+        entry["holders"][holder] = time.monotonic()
+        self._entries.move_to_end(key)
+        return entry["frame"]
+
+    def _insert(self, key, holder, frame):
+        if key not in self._entries:
+            self._entries[key] = {"frame": frame, "bytes": frame_bytes(frame), "holders": {}}
+        frame = self._hold(key, holder)
+        return frame, self._evict()
+
+    def _evict(self):
+        """Drop least recently used unpinned frames until within budget
+
+        Returns the dropped keys, for _notify once the lock is released.
+        """
+        now = time.monotonic()
+        total = sum(entry["bytes"] for entry in self._entries.values())
+        evicted = []
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            entry["holders"] = self._live_holders(entry, now)
+            if entry["holders"]:
+                continue
+            del self._entries[key]
+            total -= entry["bytes"]
+            evicted.append(key)
+        return evicted
+
+    def acquire(self, key, holder, loader=None):
+        """Return the shared frame for key and record holder as a reference
+
+        On a miss the frame is built with loader(); concurrent sessions
+        asking for the same key wait for the first load instead of
+        repeating it. Without a loader a miss returns None.
+        """
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    return self._hold(key, holder)
+                if loader is None:
+                    return None
+                pending = self._loading.get(key)
+                if pending is None:
+                    pending = self._loading[key] = threading.Event()
+                    break
+            pending.wait()
+
+        try:
+            frame = loader()
+        except BaseException:
+            with self._lock:
+                del self._loading[key]
+            pending.set()
+            raise
+
+        with self._lock:
+            del self._loading[key]
+            frame, evicted = self._insert(key, holder, frame)
+        pending.set()
+        self._notify(evicted)
+        return frame
+
+    def contains(self, key):
+        """Whether key is cached, without taking a reference to it"""
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key, holder, frame):
+        """Share a frame computed elsewhere; an existing entry wins"""
+        with self._lock:
+            frame, evicted = self._insert(key, holder, frame)
+        self._notify(evicted)
+        return frame
+
+    def touch(self, keys, holder):
+        """Refresh holder's references, e.g. once per script run"""
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._hold(key, holder)
+
+    def release(self, key, holder):
+        """Drop holder's reference so the entry becomes evictable"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["holders"].pop(holder, None)
+            evicted = self._evict()
+        self._notify(evicted)
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(entry["bytes"] for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "holders": sum(len(self._live_holders(e, now)) for e in self._entries.values())
+            }
+
+
+frames = SharedFrameCache()
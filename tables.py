@@ -0,0 +1,37 @@
+import math
+
+import numpy as np
+
+# Only one page of rows is sent to the browser, so table render cost stays
+# constant however long the history is.
+PAGE_SIZES = [25, 50, 100, 250]
+DEFAULT_PAGE_SIZE = 50
+
+
+def filter_positions(frame, column=None, low=None, high=None):
+    """Row positions whose column value lies within [low, high]"""
+    if column is None:
+        return np.arange(len(frame))
+    values = frame[column].to_numpy()
+    # NaN compares False on both sides, so missing values are filtered out
+    return np.flatnonzero((values >= low) & (values <= high))
+
+
+def sort_positions(frame, positions, column, ascending=True):
+    """Reorder row positions by a column, keeping missing values last"""
+    values = frame[column].to_numpy()[positions]
+    missing = np.isnan(values) if values.dtype.kind == "f" else np.zeros(len(values), dtype=bool)
+    order = np.argsort(values[~missing], kind="stable")
+    if not ascending:
+        order = order[::-1]
+    return np.concatenate([positions[~missing][order], positions[missing]])
+
+
+def page_count(rows, page_size):
+    return max(1, math.ceil(rows / page_size))
+
+
+def page_rows(frame, positions, page, page_size):
+    """Rows of a 1-based page, taken from frame in positions order"""
+    start = (page - 1) * page_size
+    return frame.iloc[positions[start:start + page_size]]
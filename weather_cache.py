@@ -0,0 +1,284 @@
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from cache_files import atomic_write, atomic_write_text, cache_dir
+
+# Historical archive data never changes once written, so it is kept on disk
+# indefinitely and only evicted to stay under the size budget. Data lives in
+# Parquet files partitioned by location tile and year:
+#   <CACHE_DIR>/tile=<lat>_<lon>/year=<YYYY>/<location key>.parquet
+CACHE_DIR = cache_dir("WEATHER_CACHE_DIR", "weather")
+MAX_CACHE_BYTES = int(os.environ.get("WEATHER_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+COORD_PRECISION = 2  # ~1 km, well below the archive grid resolution
+TILE_DEGREES = 1
+INDEX_FILE = "index.json"
+
+_lock = threading.Lock()
+# Per-location locks serialise read-merge-write cycles on the same files
+_key_locks = defaultdict(threading.Lock)
+# Locations a fetch in progress has written but not yet read back
+_pins = Counter()
+_filesystem = fs.LocalFileSystem(use_mmap=True)
+
+
+def round_coord(value):
+    """Round a coordinate to the precision used for cache keys"""
+    return round(float(value), COORD_PRECISION)
+
+
+def location_key(latitude, longitude, variables):
+    """Content address of a location and its variable set"""
+    payload = json.dumps({
+        "latitude": round_coord(latitude),
+        "longitude": round_coord(longitude),
+        "variables": sorted(variables)
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def tile_name(latitude, longitude):
+    """Name of the TILE_DEGREES square a point falls in"""
+    return (f"{math.floor(latitude / TILE_DEGREES) * TILE_DEGREES}"
+            f"_{math.floor(longitude / TILE_DEGREES) * TILE_DEGREES}")
+
+
+# ================= Day Coverage =================
+def merge_intervals(intervals):
+    """Merge overlapping or adjacent (start, end) date intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(start, end, covered):
+    """Return the sub-ranges of [start, end] not present in covered"""
+    gaps = []
+    cursor = start
+    for cov_start, cov_end in merge_intervals(covered):
+        if cov_end < cursor:
+            continue
+        if cov_start > end:
+            break
+        if cov_start > cursor:
+            gaps.append((cursor, cov_start - timedelta(days=1)))
+        cursor = max(cursor, cov_end + timedelta(days=1))
+        if cursor > end:
+            break
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def _read_index():
+    try:
+        with open(os.path.join(CACHE_DIR, INDEX_FILE), "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {
+        key: {
+            "tile": entry["tile"],
+            "intervals": [(date.fromisoformat(s), date.fromisoformat(e)) for s, e in entry["intervals"]]
+        }
+        for key, entry in raw.items()
+        # Skip entries left by the older JSON cache layout
+        if isinstance(entry, dict)
+    }
+
+
+def _write_index(index):
+    raw = {
+        key: {
+            "tile": entry["tile"],
+            "intervals": [[s.isoformat(), e.isoformat()] for s, e in entry["intervals"]]
+        }
+        for key, entry in index.items()
+    }
+    atomic_write_text(os.path.join(CACHE_DIR, INDEX_FILE), json.dumps(raw))
+
+
+def coverage(key):
+    """Return the merged day intervals stored for a location"""
+    with _lock:
+        entry = _read_index().get(key)
+    return entry["intervals"] if entry else []
+
+
+def missing_ranges(key, start_date, end_date):
+    """Return the sub-ranges of [start_date, end_date] not yet stored"""
+    return subtract_intervals(start_date, end_date, coverage(key))
+
+
+# ================= Parquet Storage =================
+def _path(tile, year, key):
+    return os.path.join(CACHE_DIR, f"tile={tile}", f"year={year}", f"{key}.parquet")
+
+
+def load(key, start_date, end_date, columns=None):
+    """Read a location's rows between two dates, or None if nothing is stored
+
+    Only the year partitions overlapping the range are opened; they are
+    scanned as one memory-mapped dataset with the column list pruned and
+    the date filter pushed down to the Parquet row groups.
+    """
+    with _lock:
+        entry = _read_index().get(key)
+    if entry is None:
+        return None
+    paths = [
+        _path(entry["tile"], year, key)
+        for year in range(start_date.year, end_date.year + 1)
+    ]
+    paths = [path for path in paths if os.path.exists(path)]
+    if not paths:
+        return None
+
+    dataset = ds.dataset(paths, format="parquet", filesystem=_filesystem)
+    time_field = ds.field("time")
+    table = dataset.to_table(
+        columns=None if columns is None else ["time"] + [c for c in columns if c != "time"],
+        # end_date is inclusive; hourly rows run up to 23:00 on that day
+        filter=(time_field >= pa.scalar(pd.Timestamp(start_date), type=pa.timestamp("ns")))
+        & (time_field < pa.scalar(pd.Timestamp(end_date) + pd.Timedelta(days=1), type=pa.timestamp("ns")))
+    )
+    # Bump modification times so eviction treats the location as recently used
+    for path in paths:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+    return table.to_pandas().sort_values("time", ignore_index=True)
+
+
+def _key_lock(key):
+    with _lock:
+        return _key_locks[key]
+
+
+@contextmanager
+def pinned(keys):
+    """Protect locations from eviction while a fetch writes and reads them"""
+    keys = list(keys)
+    with _lock:
+        _pins.update(keys)
+    try:
+        yield
+    finally:
+        with _lock:
+            _pins.subtract(keys)
+            for key in keys:
+                if _pins[key] <= 0:
+                    del _pins[key]
+
+
+def store(key, latitude, longitude, frame, new_intervals):
+    """Merge new rows into a location's year partitions and extend coverage"""
+    store_many([(key, latitude, longitude, frame, new_intervals)])
+
+
+def store_many(entries):
+    """Store (key, lat, lon, frame, new_intervals) entries with one index update
+
+    Works for daily and hourly frames alike. Rows in a frame replace stored
+    rows with the same timestamp, so refreshed lag-window days overwrite
+    the provisional values. Concurrent stores for one location are
+    serialised, and coverage is only extended for locations whose files
+    were all written; the first failure is raised afterwards. Eviction is
+    left to the caller (see evict), so a batch never evicts its own rows.
+    """
+    written, errors = [], []
+    for key, latitude, longitude, frame, new_intervals in entries:
+        tile = tile_name(latitude, longitude)
+        try:
+            with _key_lock(key):
+                _write_years(key, tile, frame)
+        except Exception as e:
+            errors.append(e)
+        else:
+            written.append((key, tile, new_intervals))
+
+    if written:
+        with _lock:
+            index = _read_index()
+            for key, tile, new_intervals in written:
+                existing = index.get(key, {}).get("intervals", [])
+                index[key] = {
+                    "tile": tile,
+                    "intervals": merge_intervals(existing + list(new_intervals))
+                }
+            _write_index(index)
+    if errors:
+        raise errors[0]
+
+
+def _write_years(key, tile, frame):
+    # Fixed column types keep every year file on one schema, even when the
+    # API returns an all-null column for a range
+    frame = frame.astype({column: "float64" for column in frame.columns if column != "time"})
+    frame = frame.assign(time=pd.to_datetime(frame["time"]).astype("datetime64[ns]"))
+    for year, rows in frame.groupby(frame["time"].dt.year):
+        path = _path(tile, year, key)
+        if os.path.exists(path):
+            rows = (pd.concat([pq.read_table(path).to_pandas(), rows], ignore_index=True)
+                    .drop_duplicates("time", keep="last"))
+        table = pa.Table.from_pandas(rows.sort_values("time", ignore_index=True), preserve_index=False)
+        atomic_write(path, lambda tmp_path: pq.write_table(table, tmp_path))
+
+
+def evict():
+    """Remove least recently used locations until the store fits its budget
+
+    Walks the whole store, so call it once per fetch rather than per
+    write. Pinned locations are never removed.
+    """
+    with _lock:
+        locations = defaultdict(lambda: {"mtime": 0, "size": 0, "paths": []})
+        total = 0
+        for root, _, names in os.walk(CACHE_DIR):
+            for name in names:
+                if not name.endswith(".parquet"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                location = locations[name[:-len(".parquet")]]
+                location["mtime"] = max(location["mtime"], stat.st_mtime)
+                location["size"] += stat.st_size
+                location["paths"].append(path)
+                total += stat.st_size
+
+        if total <= MAX_CACHE_BYTES:
+            return
+
+        index = _read_index()
+        for key, location in sorted(locations.items(), key=lambda item: item[1]["mtime"]):
+            if total <= MAX_CACHE_BYTES:
+                break
+            if key in _pins:
+                continue
+            for path in location["paths"]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= location["size"]
+            index.pop(key, None)
+        _write_index(index)
@@ -0,0 +1,358 @@
+import warnings
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import requests
+
+try:
+    import ijson
+except ImportError:  # optional: fall back to decoding the whole body at once
+    ijson = None
+
+import http_client
+import weather_cache
+
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+DAILY_VARIABLES = [
+    "temperature_2m_max",
+    "temperature_2m_min",
+    "precipitation_sum",
+    "rain_sum",
+    "windspeed_10m_max"
+]
+HOURLY_VARIABLES = [
+    "temperature_2m",
+    "precipitation",
+    "rain",
+    "windspeed_10m"
+]
+VARIABLES = {"daily": DAILY_VARIABLES, "hourly": HOURLY_VARIABLES}
+ROWS_PER_DAY = {"daily": 1, "hourly": 24}
+# Display names used by the tables and charts
+VARIABLE_LABELS = {
+    "time": "Date",
+    "temperature_2m_max": "Max Temp (°C)",
+    "temperature_2m_min": "Min Temp (°C)",
+    "precipitation_sum": "Precipitation (mm)",
+    "rain_sum": "Rain (mm)",
+    "windspeed_10m_max": "Max Wind (km/h)",
+    "temperature_2m": "Temp (°C)",
+    "precipitation": "Precipitation (mm)",
+    "rain": "Rain (mm)",
+    "windspeed_10m": "Wind (km/h)"
+}
+# Rollup periods and the pandas rule each one resamples with
+ROLLUP_RULES = {"daily": "D", "weekly": "W", "monthly": "MS"}
+# Daily variables derived from hourly ones: (source column, aggregation).
+# The same aggregations roll daily data up to weeks and months.
+ROLLUP_SPEC = {
+    "temperature_2m_max": ("temperature_2m", "max"),
+    "temperature_2m_min": ("temperature_2m", "min"),
+    "precipitation_sum": ("precipitation", "sum"),
+    "rain_sum": ("rain", "sum"),
+    "windspeed_10m_max": ("windspeed_10m", "max")
+}
+# The archive lags real time by a few days; recent days may still be filled
+# in, so they are returned but never marked as covered.
+ARCHIVE_LAG_DAYS = 7
+# Coordinates sent in one multi-location archive request
+MAX_BATCH_LOCATIONS = 50
+# Long ranges are split into year-sized chunks downloaded in parallel
+MAX_PARALLEL_CHUNKS = 4
+CHUNK_ATTEMPTS = 3
+# Spread statistics added next to each variable's area mean
+AREA_PERCENTILES = [10, 90]
+AREA_STATS = ["min", "max"] + [f"p{q}" for q in AREA_PERCENTILES]
+# Joins a variable and a stat; a plain "_" would turn hourly
+# temperature_2m + min into the daily temperature_2m_min column
+AREA_STAT_SEPARATOR = "__"
+
+
+def display_labels(columns):
+    """Map raw column names, including area statistics, to display names"""
+    labels = {}
+    for column in columns:
+        if column in VARIABLE_LABELS:
+            labels[column] = VARIABLE_LABELS[column]
+            continue
+        base, _, stat = column.rpartition(AREA_STAT_SEPARATOR)
+        if base in VARIABLE_LABELS and stat in AREA_STATS:
+            labels[column] = f"{VARIABLE_LABELS[base]} {stat}"
+    return labels
+
+
+def memory_report(frame):
+    """Summarise how much memory a frame holds, in total and per column"""
+    per_column = frame.memory_usage(index=True, deep=True)
+    total = int(per_column.sum())
+    return {
+        "rows": len(frame),
+        "bytes": total,
+        "bytes_per_row": total / len(frame) if len(frame) else 0.0,
+        "columns": {column: int(size) for column, size in per_column.items()}
+    }
+
+
+def normalize_frame(frame):
+    """Convert a daily or hourly frame to compact typed columns
+
+    time becomes datetime64 so comparisons never re-parse strings, weather
+    variables become float32, and the result carries
+    attrs["memory_report"].
+    """
+    frame = frame.assign(time=pd.to_datetime(frame["time"]))
+    frame = frame.astype({column: "float32" for column in frame.columns if column != "time"})
+    frame.attrs["memory_report"] = memory_report(frame)
+    return frame
+
+
+def _decode_stream(stream, resolution, n_rows):
+    """Parse archive JSON straight into preallocated NumPy buffers
+
+    Handles both a single location object and the list returned for
+    multi-location requests. Values are written as they arrive, so parsing
+    overlaps the download and no intermediate Python lists are built.
+    """
+    locations = []
+    buffers = filled = None
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if event == "start_map" and prefix in ("", "item"):
+            buffers = {"time": np.full(n_rows, np.datetime64("NaT"), dtype="datetime64[s]")}
+            buffers.update((v, np.full(n_rows, np.nan, dtype=np.float32)) for v in VARIABLES[resolution])
+            filled = dict.fromkeys(buffers, 0)
+            locations.append((buffers, filled))
+            continue
+        parts = prefix.split(".")
+        if (buffers is None or len(parts) < 3 or parts[-1] != "item"
+                or parts[-3] != resolution or parts[-2] not in buffers):
+            continue
+        column = parts[-2]
+        i = filled[column]
+        if i < n_rows and value is not None:
+            buffers[column][i] = np.datetime64(value) if column == "time" else value
+        filled[column] = i + 1
+
+    return [
+        pd.DataFrame({column: values[:filled["time"]] for column, values in buffers.items()}, copy=False)
+        for buffers, filled in locations
+    ]
+
+
+def _request_archive(points, start_date, end_date, resolution="daily"):
+    """Download one contiguous date range for up to MAX_BATCH_LOCATIONS points
+
+    Open-Meteo accepts comma-separated coordinates and answers with one
+    object per location, in request order. With ijson installed the body
+    is decoded as it streams in; otherwise it is parsed in one go.
+    """
+    params = {
+        "latitude": ",".join(str(lat) for lat, _ in points),
+        "longitude": ",".join(str(lon) for _, lon in points),
+        "start_date": start_date.strftime("%Y-%m-%d"),
+        "end_date": end_date.strftime("%Y-%m-%d"),
+        resolution: ",".join(VARIABLES[resolution]),
+        "timezone": "auto"
+    }
+    n_rows = ((end_date - start_date).days + 1) * ROWS_PER_DAY[resolution]
+    with http_client.get(ARCHIVE_URL, params=params, stream=ijson is not None) as response:
+        if ijson is not None:
+            response.raw.decode_content = True
+            return _decode_stream(response.raw, resolution, n_rows)
+        payload = response.json()
+    if not isinstance(payload, list):
+        payload = [payload]
+    return [pd.DataFrame(location[resolution]) for location in payload]
+
+
+def _final_intervals(intervals):
+    """Clip intervals to the days the archive has finished writing"""
+    cutoff = date.today() - timedelta(days=ARCHIVE_LAG_DAYS)
+    return [(s, min(e, cutoff)) for s, e in intervals if s <= cutoff]
+
+
+def _split_years(start_date, end_date):
+    """Split a date range at calendar year boundaries"""
+    chunks = []
+    cursor = start_date
+    while cursor <= end_date:
+        chunk_end = min(date(cursor.year, 12, 31), end_date)
+        chunks.append((cursor, chunk_end))
+        cursor = chunk_end + timedelta(days=1)
+    return chunks
+
+
+def _fetch_chunk(batch, start_date, end_date, resolution):
+    """Download one chunk, retrying failures that happen mid-body
+
+    http_client already retries failed requests; this also covers
+    connections dropped while the body streams in. Error statuses are not
+    retried here.
+    """
+    for attempt in range(CHUNK_ATTEMPTS):
+        try:
+            return _request_archive(batch, start_date, end_date, resolution)
+        except requests.HTTPError:
+            raise
+        except Exception:
+            if attempt == CHUNK_ATTEMPTS - 1:
+                raise
+
+
+def fetch_locations(points, start_date, end_date, progress=None, resolution="daily"):
+    """Fetch daily or hourly archive data for several (lat, lon) points
+
+    Only days missing from the local store are downloaded. Points missing
+    the same sub-ranges share batched multi-location requests, and each
+    gap is split into year chunks fetched with bounded parallelism. Every
+    chunk is stored as soon as it arrives, so a failed chunk does not cost
+    the others; the first failure is raised once all chunks have settled.
+    progress(done, total) is called after each chunk. Returns one frame
+    per point, in order, read back from the store.
+    """
+    points = [(weather_cache.round_coord(lat), weather_cache.round_coord(lon)) for lat, lon in points]
+    unique_points = list(dict.fromkeys(points))
+    variables = VARIABLES[resolution]
+    keys = {point: weather_cache.location_key(*point, variables) for point in unique_points}
+
+    chunks = []
+    try:
+        # Pinned so eviction by this or another fetch cannot remove rows
+        # between storing them and reading them back
+        with weather_cache.pinned(keys.values()):
+            by_gaps = defaultdict(list)
+            for point in unique_points:
+                gaps = weather_cache.missing_ranges(keys[point], start_date, end_date)
+                if gaps:
+                    by_gaps[tuple(gaps)].append(point)
+
+            chunks = [
+                (group[i:i + MAX_BATCH_LOCATIONS], chunk_start, chunk_end)
+                for gaps, group in by_gaps.items()
+                for gap_start, gap_end in gaps
+                for chunk_start, chunk_end in _split_years(gap_start, gap_end)
+                for i in range(0, len(group), MAX_BATCH_LOCATIONS)
+            ]
+
+            errors = []
+            if chunks:
+                with ThreadPoolExecutor(max_workers=MAX_PARALLEL_CHUNKS) as executor:
+                    futures = {executor.submit(_fetch_chunk, *chunk, resolution): chunk for chunk in chunks}
+                    for done, future in enumerate(as_completed(futures), start=1):
+                        batch, chunk_start, chunk_end = futures[future]
+                        try:
+                            frames = future.result()
+                            intervals = _final_intervals([(chunk_start, chunk_end)])
+                            weather_cache.store_many([
+                                (keys[point], *point, frame, intervals)
+                                for point, frame in zip(batch, frames)
+                            ])
+                        except Exception as e:
+                            errors.append(e)
+                        if progress is not None:
+                            progress(done, len(chunks))
+            if errors:
+                raise errors[0]
+
+            results = {}
+            for point in unique_points:
+                frame = weather_cache.load(keys[point], start_date, end_date, variables)
+                if frame is None:
+                    frame = pd.DataFrame(columns=["time"] + variables)
+                results[point] = normalize_frame(frame)
+    finally:
+        if chunks:
+            # Once per fetch: eviction walks the whole store
+            weather_cache.evict()
+    return [results[point] for point in points]
+
+
+def dataset_key(kind, points, start_date, end_date, resolution="daily"):
+    """Hashable identity of a fetched frame, for sharing it across sessions"""
+    points = tuple((weather_cache.round_coord(lat), weather_cache.round_coord(lon)) for lat, lon in points)
+    return (kind, resolution, points, start_date.isoformat(), end_date.isoformat())
+
+
+def fetch_weather_data(latitude, longitude, start_date, end_date, progress=None, resolution="daily"):
+    """Fetch archive data for a point, downloading only uncached days"""
+    return fetch_locations([(latitude, longitude)], start_date, end_date, progress, resolution)[0]
+
+
+def fetch_sites(sites, start_date, end_date, progress=None, resolution="daily"):
+    """Fetch named (name, lat, lon) sites into one long frame keyed by site
+
+    All sites go through fetch_locations together, so they share batched
+    multi-location requests and the bounded download pool. Rows are
+    stacked per site with a categorical site column.
+    """
+    frames = fetch_locations([(lat, lon) for _, lat, lon in sites], start_date, end_date,
+                             progress, resolution)
+    names = [name for name, _, _ in sites]
+    combined = pd.concat([frame.assign(site=name) for name, frame in zip(names, frames)],
+                         ignore_index=True)
+    combined["site"] = pd.Categorical(combined["site"], categories=list(dict.fromkeys(names)))
+    combined = combined[["site", "time"] + VARIABLES[resolution]]
+    combined.attrs["memory_report"] = memory_report(combined)
+    return combined
+
+
+def fetch_area_weather(points, start_date, end_date, progress=None, resolution="daily"):
+    """Fetch every grid point and aggregate them into area statistics
+
+    The returned frame keeps the usual variable columns as the area mean,
+    plus <variable>__min/__max/__pNN columns for the spread across points.
+    """
+    variables = VARIABLES[resolution]
+    frames = fetch_locations(points, start_date, end_date, progress, resolution)
+    times = pd.Index(sorted(set().union(*(frame["time"] for frame in frames))), name="time")
+
+    # (points, days, variables) cube; days a point lacks stay NaN
+    cube = np.stack([
+        frame.set_index("time").reindex(times)[variables].to_numpy(dtype=float)
+        for frame in frames
+    ])
+
+    with warnings.catch_warnings():
+        # Days with no value at any point legitimately aggregate to NaN
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        mean = np.nanmean(cube, axis=0)
+        low = np.nanmin(cube, axis=0)
+        high = np.nanmax(cube, axis=0)
+        percentiles = np.nanpercentile(cube, AREA_PERCENTILES, axis=0)
+
+    area = pd.DataFrame({"time": times})
+    for i, variable in enumerate(variables):
+        area[variable] = mean[:, i]
+    for i, variable in enumerate(variables):
+        area[f"{variable}{AREA_STAT_SEPARATOR}min"] = low[:, i]
+        area[f"{variable}{AREA_STAT_SEPARATOR}max"] = high[:, i]
+        for q, values in zip(AREA_PERCENTILES, percentiles):
+            area[f"{variable}{AREA_STAT_SEPARATOR}p{q}"] = values[:, i]
+    return normalize_frame(area)
+
+
+def is_hourly(frame):
+    return HOURLY_VARIABLES[0] in frame.columns
+
+
+def resample(frame, period):
+    """Roll an hourly or daily frame up to daily, weekly or monthly rows
+
+    Output columns use the daily variable names (max/min/sum per
+    ROLLUP_SPEC), so rollups plug into the same tables, charts and
+    forecasts as fetched daily data. Area statistic columns are dropped.
+    """
+    if is_hourly(frame):
+        spec = ROLLUP_SPEC
+    else:
+        spec = {column: (column, how) for column, (_, how) in ROLLUP_SPEC.items()}
+    resampler = frame.set_index("time").resample(ROLLUP_RULES[period])
+    # min_count=1 keeps periods with no values at all (e.g. archive-lag
+    # days) as NaN instead of summing them to 0
+    rolled = pd.DataFrame({
+        column: getattr(resampler[source], how)(**({"min_count": 1} if how == "sum" else {}))
+        for column, (source, how) in spec.items()
+    }).reset_index()
+    return normalize_frame(rolled)